@@ -3,24 +3,25 @@
 from __future__ import annotations
 
 import _thread
-import asyncio
+import functools
 import importlib
-import inspect
 import io
 import logging
 import os
 import platform
 import sys
-from contextlib import contextmanager
+from asyncio import _get_running_loop
 from contextvars import ContextVar
-from pathlib import Path
-from types import ModuleType
+from types import FrameType, ModuleType
 from typing import TYPE_CHECKING, Any, TypeVar, Union
 
 if TYPE_CHECKING:
     import socket
     import threading
-    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from collections.abc import Callable, Iterable, Sequence
+    from types import TracebackType
+
+    from typing_extensions import Self
 
     _ModuleList = Union[Sequence[Union[str, ModuleType]], None]
     _ModuleOrModuleList = Union[str, ModuleType, _ModuleList]
@@ -46,72 +47,97 @@ class BlockingError(Exception):
         super().__init__(f"Blocking call to {func}")
 
 
-def _blocking_error(func: Callable[..., Any]) -> BlockingError:
-    if inspect.isbuiltin(func):
-        msg = f"Blocking call to {func.__qualname__} ({func.__self__})"
-    elif inspect.ismethoddescriptor(func):
-        msg = f"Blocking call to {func}"
-    else:
-        msg = f"Blocking call to {func.__module__}.{func.__qualname__}"
-    return BlockingError(msg)
-
-
 _T = TypeVar("_T")
 
+# Separator to normalize to "/" when matching can_block_functions filenames.
+_ALT_SEP = os.sep if os.sep != "/" else None
+
 blockbuster_skip: ContextVar[bool] = ContextVar("blockbuster_skip")
 
 
+def _no_predicate(*_: Any, **__: Any) -> bool:
+    return False
+
+
+def _can_block_in_stack(
+    frame: FrameType | None,
+    modules: tuple[str, ...],
+    excluded_modules: tuple[str, ...],
+    can_block_functions: list[tuple[str, Iterable[str]]],
+) -> bool:
+    """Check if blocking is allowed for a call made from the given frame."""
+    if not modules and not can_block_functions:
+        return False
+    in_test_module = False
+    while frame:
+        code = frame.f_code
+        frame_file_name = code.co_filename
+        if (
+            modules
+            and not in_test_module
+            and frame_file_name.startswith(modules)
+            and not frame_file_name.startswith(excluded_modules)
+        ):
+            in_test_module = True
+            if not can_block_functions:
+                # Nothing up the stack can allow the call anymore.
+                return False
+        if _ALT_SEP:
+            frame_file_name = frame_file_name.replace(_ALT_SEP, "/")
+        function_name = code.co_name
+        for filename, functions in can_block_functions:
+            if function_name in functions and frame_file_name.endswith(filename):
+                return True
+        frame = frame.f_back
+    return bool(modules) and not in_test_module
+
+
 def _wrap_blocking(
-    modules: list[str],
-    excluded_modules: list[str],
+    modules: tuple[str, ...],
+    excluded_modules: tuple[str, ...],
     func: Callable[..., _T],
     func_name: str,
     can_block_functions: list[tuple[str, Iterable[str]]],
     can_block_predicate: Callable[..., bool],
 ) -> Callable[..., _T]:
     """Wrap blocking function."""
+    if can_block_predicate is _no_predicate:
 
-    def wrapper(*args: Any, **kwargs: Any) -> _T:
-        if blockbuster_skip.get(False):
-            return func(*args, **kwargs)
-        try:
-            asyncio.get_running_loop()
-        except RuntimeError:
+        def wrapper(*args: Any, **kwargs: Any) -> _T:
+            if _get_running_loop() is None or blockbuster_skip.get(False):
+                return func(*args, **kwargs)
+            skip_token = blockbuster_skip.set(True)
+            try:
+                if _can_block_in_stack(
+                    sys._getframe(1),  # noqa: SLF001
+                    modules,
+                    excluded_modules,
+                    can_block_functions,
+                ):
+                    return func(*args, **kwargs)
+                raise BlockingError(func_name)
+            finally:
+                blockbuster_skip.reset(skip_token)
+
+        return wrapper
+
+    def wrapper_with_predicate(*args: Any, **kwargs: Any) -> _T:
+        if _get_running_loop() is None or blockbuster_skip.get(False):
             return func(*args, **kwargs)
         skip_token = blockbuster_skip.set(True)
         try:
-            if can_block_predicate(*args, **kwargs):
+            if can_block_predicate(*args, **kwargs) or _can_block_in_stack(
+                sys._getframe(1),  # noqa: SLF001
+                modules,
+                excluded_modules,
+                can_block_functions,
+            ):
                 return func(*args, **kwargs)
-            frame = inspect.currentframe()
-            in_test_module = False
-            while frame:
-                frame_info = inspect.getframeinfo(frame)
-                if not in_test_module:
-                    in_excluded_module = False
-                    for excluded_module in excluded_modules:
-                        if frame_info.filename.startswith(excluded_module):
-                            in_excluded_module = True
-                            break
-                    if not in_excluded_module:
-                        for module in modules:
-                            if frame_info.filename.startswith(module):
-                                in_test_module = True
-                                break
-                frame_file_name = Path(frame_info.filename).as_posix()
-                for filename, functions in can_block_functions:
-                    if (
-                        frame_file_name.endswith(filename)
-                        and frame_info.function in functions
-                    ):
-                        return func(*args, **kwargs)
-                frame = frame.f_back
-            if not modules or in_test_module:
-                raise BlockingError(func_name)
-            return func(*args, **kwargs)
+            raise BlockingError(func_name)
         finally:
             blockbuster_skip.reset(skip_token)
 
-    return wrapper
+    return wrapper_with_predicate
 
 
 def _resolve_module_paths(modules: Sequence[str | ModuleType]) -> list[str]:
@@ -127,6 +153,12 @@ def _resolve_module_paths(modules: Sequence[str | ModuleType]) -> list[str]:
     return resolved
 
 
+def _function_names(functions: str | Iterable[str]) -> frozenset[str]:
+    if isinstance(functions, str):
+        return frozenset((functions,))
+    return frozenset(functions)
+
+
 class BlockBusterFunction:
     """BlockBusterFunction class."""
 
@@ -138,7 +170,7 @@ class BlockBusterFunction:
         scanned_modules: _ModuleOrModuleList = None,
         excluded_modules: _ModuleList = None,
         can_block_functions: list[tuple[str, Iterable[str]]] | None = None,
-        can_block_predicate: Callable[..., bool] = lambda *_, **__: False,
+        can_block_predicate: Callable[..., bool] = _no_predicate,
     ) -> None:
         """Create a BlockBusterFunction.
 
@@ -179,9 +211,10 @@ class BlockBusterFunction:
             self.full_name = func_name
         else:
             self.full_name = f"{module.__name__}.{func_name}"
-        self.can_block_functions: list[tuple[str, Iterable[str]]] = (
-            can_block_functions or []
-        )
+        self.can_block_functions: list[tuple[str, Iterable[str]]] = [
+            (filename, _function_names(functions))
+            for filename, functions in can_block_functions or []
+        ]
         self.can_block_predicate: Callable[..., bool] = can_block_predicate
         self.activated = False
         if isinstance(scanned_modules, (str, ModuleType)):
@@ -197,8 +230,8 @@ class BlockBusterFunction:
             return self
         self.activated = True
         checker = _wrap_blocking(
-            self._scanned_modules,
-            self._excluded_modules,
+            tuple(self._scanned_modules),
+            tuple(self._excluded_modules),
             self.original_func,
             self.full_name,
             self.can_block_functions,
@@ -233,9 +266,7 @@ class BlockBusterFunction:
             functions (str | Iterable[str]): The functions where blocking is allowed.
 
         """
-        if isinstance(functions, str):
-            functions = {functions}
-        self.can_block_functions.append((filename, functions))
+        self.can_block_functions.append((filename, _function_names(functions)))
         return self
 
 
@@ -255,6 +286,12 @@ def _get_time_wrapped_functions(
     }
 
 
+@functools.lru_cache(maxsize=None)
+def _scandir_iterator_type() -> type:
+    with os.scandir() as scandir_it:
+        return type(scandir_it)
+
+
 def _get_os_wrapped_functions(
     modules: _ModuleOrModuleList = None, excluded_modules: _ModuleList = None
 ) -> dict[str, BlockBusterFunction]:
@@ -347,13 +384,12 @@ def _get_os_wrapped_functions(
     )
 
     if platform.python_implementation() != "CPython" or sys.version_info >= (3, 9):
-        with os.scandir() as scandir_it:
-            functions["os.scandir"] = BlockBusterFunction(
-                type(scandir_it),
-                "__next__",
-                scanned_modules=modules,
-                excluded_modules=excluded_modules,
-            )
+        functions["os.scandir"] = BlockBusterFunction(
+            _scandir_iterator_type(),
+            "__next__",
+            scanned_modules=modules,
+            excluded_modules=excluded_modules,
+        )
 
     for method in (
         "ismount",
@@ -391,10 +427,12 @@ def _get_os_wrapped_functions(
     )
 
     def os_rw_exclude(fd: int, *_: Any, **__: Any) -> bool:
-        return hasattr(os, "get_blocking") and not os.get_blocking(fd)
+        return not os.get_blocking(fd)
 
     os_rw_kwargs = (
-        {} if platform.system() == "Windows" else {"can_block_predicate": os_rw_exclude}
+        {"can_block_predicate": os_rw_exclude}
+        if platform.system() != "Windows" and hasattr(os, "get_blocking")
+        else {}
     )
 
     functions["os.read"] = BlockBusterFunction(
@@ -434,7 +472,7 @@ def _get_io_wrapped_functions(
         return False
 
     def file_write_exclude(file: io.IOBase, *_: Any, **__: Any) -> bool:
-        if file in {stdout, stderr, sys.stdout, sys.stderr} or file.isatty():
+        if file in (stdout, stderr, sys.stdout, sys.stderr) or file.isatty():
             return True
         try:
             file.fileno()
@@ -668,11 +706,24 @@ class BlockBuster:
         for wrapped_function in self.functions.values():
             wrapped_function.deactivate()
 
+    def __enter__(self) -> Self:
+        """Activate all the functions."""
+        self.activate()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Deactivate all the functions."""
+        self.deactivate()
+
 
-@contextmanager
 def blockbuster_ctx(
     scanned_modules: _ModuleOrModuleList = None, *, excluded_modules: _ModuleList = None
-) -> Iterator[BlockBuster]:
+) -> BlockBuster:
     """Context manager for using BlockBuster.
 
     Args:
@@ -686,7 +737,4 @@ def blockbuster_ctx(
             part of the scanned modules.
             Can be a list of module names or module objects.
     """
-    blockbuster = BlockBuster(scanned_modules, excluded_modules=excluded_modules)
-    blockbuster.activate()
-    yield blockbuster
-    blockbuster.deactivate()
+    return BlockBuster(scanned_modules, excluded_modules=excluded_modules)
@@ -34,12 +34,25 @@ async def to_thread(func: Callable[..., _T], /, *args: Any, **kwargs: Any) -> _T
     return await loop.run_in_executor(None, func_call)
 
 
-@pytest.fixture(autouse=True)
-def blockbuster() -> Iterator[BlockBuster]:
+@pytest.fixture(scope="session")
+def blockbuster_session() -> Iterator[BlockBuster]:
     with blockbuster_ctx() as bb:
         yield bb
 
 
+@pytest.fixture(autouse=True)
+def blockbuster(blockbuster_session: BlockBuster) -> Iterator[BlockBuster]:
+    can_block_functions = {
+        name: list(function.can_block_functions)
+        for name, function in blockbuster_session.functions.items()
+    }
+    yield blockbuster_session
+    for name, function in blockbuster_session.functions.items():
+        function.can_block_functions[:] = can_block_functions[name]
+    # Reactivate the functions that the test may have deactivated.
+    blockbuster_session.activate()
+
+
 @pytest.fixture
 def test_file() -> Iterator[Path]:
     with tempfile.NamedTemporaryFile(delete=False) as f:
@@ -218,6 +231,16 @@ async def test_cleanup(blockbuster: BlockBuster, test_file: Path) -> None:
         f.write(b"foo")
 
 
+async def test_context_manager_cleanup_on_error(
+    blockbuster: BlockBuster, test_file: Path
+) -> None:
+    blockbuster.deactivate()
+    with pytest.raises(BlockingError), BlockBuster():
+        time.sleep(1)  # noqa: ASYNC251
+    with test_file.open(mode="wb") as f:
+        f.write(b"foo")
+
+
 async def test_scanned_modules(blockbuster: BlockBuster, test_file: Path) -> None:
     blockbuster.deactivate()
     # Multiple scanned packages